@@ -1,117 +1,345 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 import pandas as pd
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import copy
+import functools
+import hashlib
 import io
-import base64
-import traceback
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import logging
+import math
+import pickle
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# python-docx, openpyxl и matplotlib импортируются лениво внутри генераторов:
+# Streamlit перезапускает скрипт при каждом изменении виджета, а эти пакеты
+# нужны только в момент создания отчёта.
+
+@functools.lru_cache(maxsize=None)
+def _chart_figure():
+    """Общая фигура 5×4 дюйма для диаграмм DOCX (создаётся один раз на процесс).
+
+    Используется объектный API matplotlib без pyplot: фигура не регистрируется
+    в глобальном менеджере, а доступ к ней сериализуется _CHART_LOCK.
+    """
+    from matplotlib.figure import Figure
+    return Figure(figsize=(5, 4))
+
+# Загрузки выполняются в рабочих потоках Streamlit, а фигура одна на всех
+_CHART_LOCK = threading.Lock()
+
+# Ширина области текста DOCX — 6,5 дюйма (Inches(6.5).twips) и деление колонок 25%/75%
+_TEXT_WIDTH_TWIPS = 9360
+_FIRST_COL_TWIPS = int(_TEXT_WIDTH_TWIPS * 0.25)
+_SECOND_COL_TWIPS = int(_TEXT_WIDTH_TWIPS * 0.75)
+
+@functools.lru_cache(maxsize=None)
+def _docx_lengths():
+    """Размеры DOCX-отчёта (Pt/Inches), создаются один раз на процесс"""
+    from types import SimpleNamespace
+    from docx.shared import Inches, Pt
+    return SimpleNamespace(
+        pt2=Pt(2),
+        pt6=Pt(6),
+        pt13=Pt(13),
+        pt16=Pt(16),
+        picture_width=Inches(5),
+        list_indent=Inches(0.25),
+    )
+
+@functools.lru_cache(maxsize=None)
+def _docx_template_bytes():
+    """Пустой DOCX с настроенным стилем Normal, сохраняется один раз на процесс.
+
+    Открыть документ из готовых байтов дешевле, чем Document(), который каждый раз
+    распаковывает шаблон по умолчанию из пакета python-docx.
+    """
+    from docx import Document
+    template = Document()
+    style = template.styles['Normal']
+    style.font.name = 'Calibri Light'
+    style.font.size = _docx_lengths().pt13
+    buffer = io.BytesIO()
+    template.save(buffer)
+    return buffer.getvalue()
 
 def set_col_width(col, width_twips):
-    """Устанавливает точную ширину колонки в таблице Word"""
+    """Устанавливает точную ширину колонки в таблице Word.
+
+    Ширина пишется в сетку таблицы (w:gridCol), откуда её берут строки, добавленные
+    позже через add_row(), и в единственный <w:tcW> уже созданных ячеек.
+    """
+    from docx.shared import Twips
+    width = Twips(int(width_twips))
+    col.width = width
     for cell in col.cells:
-        tc = cell._element.tcPr
-        tcW = OxmlElement('w:tcW')
-        tcW.set(qn('w:w'), str(int(width_twips)))
-        tcW.set(qn('w:type'), 'dxa')
-        tc.append(tcW)
-
-def add_table_from_df(doc, df, header_text=None):
-    """Добавляет таблицу из DataFrame в документ с заголовком и обработкой пустых данных"""
+        cell.width = width
+
+def _add_spacer(doc, points):
+    """Добавляет пустой абзац-отступ; интервал задаётся стилем «Spacer N pt», создаваемым один раз на документ"""
+    name = f'Spacer {points} pt'
+    try:
+        style = doc.styles[name]
+    except KeyError:
+        from docx.enum.style import WD_STYLE_TYPE
+        from docx.shared import Pt
+        style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = doc.styles['Normal']
+        style.hidden = True
+        style.paragraph_format.space_after = Pt(points)
+    return doc.add_paragraph(style=style)
+
+def _add_line_paragraphs(doc, lines, left_indent=None):
+    """Абзацы списка из пар (строка, стиль) с интервалом 2 pt после каждого.
+
+    Первый абзац каждого стиля создаётся через doc.add_paragraph (поиск стиля по
+    имени, настройка отступов), остальные — копии его XML с заменой текста.
+    """
+    space_after = _docx_lengths().pt2
+    body = doc.element.body
+    templates = {}
+    for line, style in lines:
+        template = templates.get(style)
+        if template is None:
+            p = doc.add_paragraph(line, style=style)
+            if left_indent is not None:
+                p.paragraph_format.left_indent = left_indent
+            p.paragraph_format.space_after = space_after
+            templates[style] = p._p
+        else:
+            p_el = copy.deepcopy(template)
+            p_el.r_lst[0].text = line
+            body._insert_p(p_el)
+
+def _pass_fail_percentages(data):
+    """Доли PASS/FAIL в процентах (общая формула для DOCX, HTML и XLSX; 0% при нуле тест-кейсов)"""
+    total = data['total_tc']
+    pass_pct = data['pass'] / total * 100 if total > 0 else 0
+    return pass_pct, 100 - pass_pct
+
+@functools.lru_cache(maxsize=64)
+def _text_lines(text):
+    """Непустые строки многострочного поля без пробелов по краям.
+
+    Кэш общий для DOCX, HTML и XLSX: одно и то же поле разбирается один раз.
+    """
+    return tuple(line for line in (raw.strip() for raw in text.splitlines()) if line)
+
+def _table_data(df):
+    """Снимок DataFrame для генераторов: названия колонок и строки в виде кортежей.
+
+    Пропуски (NaN, None, pd.NA) заменяются на None одной векторной операцией,
+    поэтому в циклах по ячейкам достаточно проверки value is None.
+    """
+    df = df.astype(object).where(df.notna(), None)
+    return {"columns": list(df.columns), "rows": list(df.itertuples(index=False, name=None))}
+
+def _normalize_report_tables(module_data_list, defects_df):
+    """Один проход по таблицам из формы; результат общий для DOCX, HTML и XLSX"""
+    modules = [{"title": m["title"], **_table_data(m["df"])} for m in module_data_list]
+    return modules, _table_data(defects_df)
+
+@functools.lru_cache(maxsize=None)
+def _table_cell_paragraphs():
+    """Готовые абзацы для ячеек таблиц: (обычный, заголовок).
+
+    Отступы 2 pt, шрифт 13 pt (у заголовка — жирный), один пустой ран под текст.
+    """
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    def paragraph(rpr):
+        return parse_xml(
+            f'<w:p {nsdecls("w")}><w:pPr><w:spacing w:after="40" w:before="40"/></w:pPr>'
+            f'<w:r><w:rPr>{rpr}</w:rPr></w:r></w:p>'
+        )
+    return paragraph('<w:sz w:val="26"/>'), paragraph('<w:b/><w:sz w:val="26"/>')
+
+def _fill_table_cell(cell, text, header=False):
+    """Записывает текст в пустую ячейку новой таблицы сразу готовым XML.
+
+    Пустой абзац ячейки заменяется копией заготовки целиком — без cell.text,
+    run.font и paragraph_format, которые создают элементы по одному.
+    """
+    body, head = _table_cell_paragraphs()
+    tc = cell._tc
+    p = copy.deepcopy(head if header else body)
+    tc.replace(tc.p_lst[0], p)  # новая ячейка содержит один пустой абзац
+    p.r_lst[0].text = text  # сеттер CT_R экранирует текст и превращает \n и \t в w:br и w:tab
+
+def add_table_from_df(doc, table_data, header_text=None):
+    """Добавляет таблицу (результат _table_data) в документ с заголовком и обработкой пустых данных"""
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
     # 🔴 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: проверка до создания таблицы
-    if df.empty or len(df.columns) == 0:
+    columns, rows = table_data["columns"], table_data["rows"]
+    if not rows or not columns:
         if header_text:
             p = doc.add_paragraph()
             p.add_run(f"{header_text}: ").bold = True
             p.add_run("нет данных для отображения")
         else:
             doc.add_paragraph("Нет данных для отображения")
-        doc.add_paragraph().paragraph_format.space_after = Pt(6)
+        _add_spacer(doc, 6)
         return
 
     # Заголовок таблицы (опционально)
     if header_text:
         p = doc.add_paragraph()
         p.add_run(header_text).bold = True
-        p.paragraph_format.space_after = Pt(6)
+        p.paragraph_format.space_after = _docx_lengths().pt6
 
     # Создание таблицы
-    table = doc.add_table(rows=1, cols=len(df.columns))
+    table = doc.add_table(rows=1, cols=len(columns))
     table.style = 'Table Grid'
     table.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
 
     # Настройка ширины колонок (25%/75% как в образце)
-    total_width = Inches(6.5)
-    num_cols = len(df.columns)
+    num_cols = len(columns)
     if num_cols > 0:
-        first_width_twips = int(total_width.twips * 0.25)
-        remaining_width_twips = total_width.twips - first_width_twips
+        first_width_twips = _FIRST_COL_TWIPS
+        remaining_width_twips = _TEXT_WIDTH_TWIPS - first_width_twips
         other_width_twips = int(remaining_width_twips / (num_cols - 1)) if num_cols > 1 else int(remaining_width_twips)
         
-        set_col_width(table.columns[0], first_width_twips)
+        table_columns = table.columns
+        set_col_width(table_columns[0], first_width_twips)
         for i in range(1, num_cols):
-            set_col_width(table.columns[i], other_width_twips)
-
-    # Заголовки колонок
-    hdr_cells = table.rows[0].cells
-    for i, column in enumerate(df.columns):
-        hdr_cells[i].text = str(column)
-        for paragraph in hdr_cells[i].paragraphs:
-            for run in paragraph.runs:
-                run.font.bold = True
-                run.font.size = Pt(13)
-            paragraph.paragraph_format.space_after = Pt(2)
-            paragraph.paragraph_format.space_before = Pt(2)
-
-    # Данные таблицы
-    for _, row in df.iterrows():
-        row_cells = table.add_row().cells
-        for i, value in enumerate(row):
-            # 🔴 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: обработка NaN/None
-            display_value = str(value) if pd.notna(value) else "—"
-            row_cells[i].text = display_value
-            for paragraph in row_cells[i].paragraphs:
-                for run in paragraph.runs:
-                    run.font.size = Pt(13)
-                paragraph.paragraph_format.space_after = Pt(2)
-                paragraph.paragraph_format.space_before = Pt(2)
-
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
-
-def generate_docx(data, module_data_list, defects_df):
+            set_col_width(table_columns[i], other_width_twips)
+
+    # Заголовки колонок (жирный 13 pt, отступы 2 pt)
+    for cell, column in zip(table._cells, columns):
+        _fill_table_cell(cell, str(column), header=True)
+
+    # Данные таблицы: строка-заготовка собирается один раз (add_row() с ширинами
+    # из сетки и абзацами-заготовками в ячейках), остальные строки — её копии,
+    # в которых меняется только текст ранов. Так не нужны ни add_row(), ни обёртки
+    # ячеек python-docx на каждую строку
+    body_p, _ = _table_cell_paragraphs()
+    template_tr = table.add_row()._tr
+    for tc in template_tr.tc_lst:
+        tc.replace(tc.p_lst[0], copy.deepcopy(body_p))
+    tbl = table._tbl
+    tbl.remove(template_tr)
+    for row_values in rows:
+        tr = copy.deepcopy(template_tr)
+        for run, value in zip(tr.xpath('./w:tc/w:p/w:r'), row_values):
+            # 🔴 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: обработка NaN/None (пропуски уже приведены к None)
+            run.text = str(value) if value is not None else "—"
+        tbl.append(tr)
+
+    _add_spacer(doc, 12)
+
+@functools.lru_cache(maxsize=None)
+def _kv_table_xml(first_width_twips, second_width_twips):
+    """Заготовки таблицы «метка — значение»: (пустая <w:tbl> со стилем и сеткой, строка <w:tr>).
+
+    Ширины колонок заданы и в сетке таблицы, и одним <w:tcW> в каждой ячейке.
+    """
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    tbl = parse_xml(
+        f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        f'</w:tblPr><w:tblGrid><w:gridCol w:w="{first_width_twips}"/><w:gridCol w:w="{second_width_twips}"/></w:tblGrid></w:tbl>'
+    )
+    def tc(width_twips, rpr):
+        return (
+            f'<w:tc><w:tcPr><w:tcW w:w="{width_twips}" w:type="dxa"/></w:tcPr>'
+            f'<w:p><w:pPr><w:jc w:val="left"/></w:pPr><w:r>{rpr}</w:r></w:p></w:tc>'
+        )
+    tr = parse_xml(
+        f'<w:tr {nsdecls("w")}>{tc(first_width_twips, "<w:rPr><w:b/></w:rPr>")}{tc(second_width_twips, "")}</w:tr>'
+    )
+    return tbl, tr
+
+def _add_kv_table(doc, fields, first_width_twips, second_width_twips):
+    """Добавляет таблицу «метка — значение» из 2 колонок (метки жирным, выравнивание влево).
+
+    Таблица собирается из копий готовых XML-заготовок вместо поячеечного API python-docx.
+    """
+    tbl_template, tr_template = _kv_table_xml(int(first_width_twips), int(second_width_twips))
+    tbl = copy.deepcopy(tbl_template)
+    for label, value in fields:
+        tr = copy.deepcopy(tr_template)
+        label_run, value_run = tr.xpath('./w:tc/w:p/w:r')
+        label_run.text = label
+        value_run.text = value
+        tbl.append(tr)
+    doc.element.body._insert_tbl(tbl)
+
+@functools.lru_cache(maxsize=32)
+def _render_charts(pass_count, fail_count, s1_count, s2_count):
+    """PNG-байты диаграмм DOCX-отчёта: (результаты тест-кейсов, дефекты по серьёзности).
+
+    Рендер matplotlib — самая тяжёлая часть отчёта, поэтому готовые картинки
+    кэшируются по четырём числам, от которых они зависят.
+    """
+    with _CHART_LOCK:
+        fig = _chart_figure()
+        
+        # Диаграмма 1: Распределение результатов
+        # (fig.clear() вместо ax.clear(): круговая диаграмма меняет пропорции и рамку осей)
+        fig.clear()
+        ax = fig.add_subplot()
+        ax.pie(
+            [pass_count, fail_count],
+            labels=['PASS', 'FAIL'],
+            autopct='%1.1f%%',
+            colors=['#4CAF50', '#F44336'],
+            startangle=90
+        )
+        ax.set_title('Рис. 1. Распределение результатов тест-кейсов')
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+        pie_png = buf.getvalue()
+        
+        # Диаграмма 2: Дефекты по серьёзности
+        fig.clear()
+        ax = fig.add_subplot()
+        bars = ax.bar(
+            ['Critical (S1)', 'Major (S2)'],
+            [s1_count, s2_count],
+            color=['#F44336', '#FF9800'],
+            width=0.5
+        )
+        ax.set_title('Рис. 2. Дефекты по уровню серьёзности')
+        ax.set_ylabel('Количество')
+        ax.set_ylim(0, max(s1_count, s2_count, 1) * 1.3)
+        for bar in bars:
+            h = bar.get_height()
+            if h > 0:
+                ax.text(
+                    bar.get_x() + bar.get_width()/2,
+                    h + 0.05,
+                    str(int(h)),
+                    ha='center',
+                    va='bottom'
+                )
+        ax.grid(axis='y', alpha=0.3, linestyle='--')
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+        bar_png = buf.getvalue()
+    
+    return pie_png, bar_png
+
+def generate_docx(data, module_data_list, defects):
     """Генерирует отчёт в точном соответствии с образцом из PDF"""
-    doc = Document()
-    
-    # Настройка стиля документа
-    style = doc.styles['Normal']
-    style.font.name = 'Calibri Light'
-    style.font.size = Pt(13)
+    from docx import Document
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    lengths = _docx_lengths()
+
+    # Шрифт стиля Normal уже задан в шаблоне
+    doc = Document(io.BytesIO(_docx_template_bytes()))
     
     # === ЗАГОЛОВОК ОТЧЁТА (центрированный, крупный) ===
     title = doc.add_heading(data["report_title"], 0)
     title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
     title_font = title.runs[0].font
-    title_font.size = Pt(16)
+    title_font.size = lengths.pt16
     title_font.bold = True
     
     # === ТАБЛИЦА С ОСНОВНОЙ ИНФОРМАЦИЕЙ (6 строк × 2 колонки) ===
-    total_width_twips = Inches(6.5).twips
-    first_col_width_twips = int(total_width_twips * 0.25)
-    second_col_width_twips = int(total_width_twips * 0.75)
-    
-    info_table = doc.add_table(rows=6, cols=2)
-    info_table.style = 'Table Grid'
-    set_col_width(info_table.columns[0], first_col_width_twips)
-    set_col_width(info_table.columns[1], second_col_width_twips)
+    first_col_width_twips = _FIRST_COL_TWIPS
+    second_col_width_twips = _SECOND_COL_TWIPS
     
     fields = [
         ('Проект:', data["project"]),
@@ -121,29 +349,14 @@ def generate_docx(data, module_data_list, defects_df):
         ('Дата формирования отчёта:', data["report_date"]),
         ('QA-инженер:', data["engineer"])
     ]
-    for i, (label, value) in enumerate(fields):
-        cell1 = info_table.cell(i, 0)
-        cell1.text = label
-        cell1.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-        for run in cell1.paragraphs[0].runs:
-            run.font.bold = True
-        
-        cell2 = info_table.cell(i, 1)
-        cell2.text = value
-        cell2.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    _add_kv_table(doc, fields, first_col_width_twips, second_col_width_twips)
     
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
+    _add_spacer(doc, 12)
     
     # === РАЗДЕЛ 1: КРАТКОЕ РЕЗЮМЕ ===
     doc.add_heading('1. КРАТКОЕ РЕЗЮМЕ', 1)
-    summary_table = doc.add_table(rows=8, cols=2)
-    summary_table.style = 'Table Grid'
-    set_col_width(summary_table.columns[0], first_col_width_twips)
-    set_col_width(summary_table.columns[1], second_col_width_twips)
     
-    total = data['total_tc']
-    pass_pct = data['pass'] / total * 100 if total > 0 else 0
-    fail_pct = 100 - pass_pct
+    pass_pct, fail_pct = _pass_fail_percentages(data)
     
     summary_fields = [
         ('Статус релиза:', data['release_status']),
@@ -155,74 +368,19 @@ def generate_docx(data, module_data_list, defects_df):
         ('Основной риск:', data['risk']),
         ('Рекомендация:', data['recommendation'])
     ]
-    for i, (label, value) in enumerate(summary_fields):
-        cell1 = summary_table.cell(i, 0)
-        cell1.text = label
-        cell1.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-        for run in cell1.paragraphs[0].runs:
-            run.font.bold = True
-        
-        cell2 = summary_table.cell(i, 1)
-        cell2.text = value
-        cell2.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    _add_kv_table(doc, summary_fields, first_col_width_twips, second_col_width_twips)
     
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
+    _add_spacer(doc, 12)
     
     # === ДИАГРАММЫ ===
-    # Диаграмма 1: Распределение результатов
-    plt.figure(figsize=(5, 4))
-    plt.pie(
-        [data['pass'], data['fail']],
-        labels=['PASS', 'FAIL'],
-        autopct='%1.1f%%',
-        colors=['#4CAF50', '#F44336'],
-        startangle=90
-    )
-    plt.title('Рис. 1. Распределение результатов тест-кейсов')
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    buf.seek(0)
-    plt.close()
-    
-    doc.add_picture(buf, width=Inches(5))
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
-    
-    # Диаграмма 2: Дефекты по серьёзности
-    plt.figure(figsize=(5, 4))
-    bars = plt.bar(
-        ['Critical (S1)', 'Major (S2)'],
-        [data['s1'], data['s2']],
-        color=['#F44336', '#FF9800'],
-        width=0.5
-    )
-    plt.title('Рис. 2. Дефекты по уровню серьёзности')
-    plt.ylabel('Количество')
-    plt.ylim(0, max(data['s1'], data['s2'], 1) * 1.3)
-    for bar in bars:
-        h = bar.get_height()
-        if h > 0:
-            plt.text(
-                bar.get_x() + bar.get_width()/2,
-                h + 0.05,
-                str(int(h)),
-                ha='center',
-                va='bottom'
-            )
-    plt.grid(axis='y', alpha=0.3, linestyle='--')
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    buf.seek(0)
-    plt.close()
-    
-    doc.add_picture(buf, width=Inches(5))
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
+    pie_png, bar_png = _render_charts(data['pass'], data['fail'], data['s1'], data['s2'])
+    doc.add_picture(io.BytesIO(pie_png), width=lengths.picture_width)
+    _add_spacer(doc, 12)
+    doc.add_picture(io.BytesIO(bar_png), width=lengths.picture_width)
+    _add_spacer(doc, 12)
     
     # === РАЗДЕЛ 2: КОНТЕКСТ ТЕСТИРОВАНИЯ ===
     doc.add_heading('2. КОНТЕКСТ ТЕСТИРОВАНИЯ', 1)
-    context_table = doc.add_table(rows=6, cols=2)
-    context_table.style = 'Table Grid'
-    set_col_width(context_table.columns[0], first_col_width_twips)
-    set_col_width(context_table.columns[1], second_col_width_twips)
     
     context_fields = [
         ('Устройство / Браузер:', data['device_browser']),
@@ -232,51 +390,35 @@ def generate_docx(data, module_data_list, defects_df):
         ('Инструменты:', data['tools']),
         ('Методология:', data['methodology'])
     ]
-    for i, (label, value) in enumerate(context_fields):
-        cell1 = context_table.cell(i, 0)
-        cell1.text = label
-        cell1.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-        for run in cell1.paragraphs[0].runs:
-            run.font.bold = True
-        
-        cell2 = context_table.cell(i, 1)
-        cell2.text = value
-        cell2.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    _add_kv_table(doc, context_fields, first_col_width_twips, second_col_width_twips)
     
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
+    _add_spacer(doc, 12)
     
     # === РАЗДЕЛ 3: РЕЗУЛЬТАТЫ ПО МОДУЛЯМ ===
     doc.add_heading('3. РЕЗУЛЬТАТЫ ТЕСТИРОВАНИЯ ПО МОДУЛЯМ', 1)
     for idx, module_info in enumerate(module_data_list):
-        title = module_info['title']
-        df = module_info['df']
-        doc.add_heading(f'3.{idx+1}. {title}', 2)
-        add_table_from_df(doc, df)
+        doc.add_heading(f'3.{idx+1}. {module_info["title"]}', 2)
+        add_table_from_df(doc, module_info)
     
     # === РАЗДЕЛ 4: АНАЛИЗ ДЕФЕКТОВ ===
     doc.add_heading('4. АНАЛИЗ ДЕФЕКТОВ', 1)
-    add_table_from_df(doc, defects_df)
+    add_table_from_df(doc, defects)
     
     # Последствия: просто текст после заголовка без лишних отступов
     p = doc.add_paragraph()
     p.add_run('Последствия: ').bold = True
     p.add_run(data['consequences'])
-    doc.add_paragraph().paragraph_format.space_after = Pt(6)
+    _add_spacer(doc, 6)
     
     # === РАЗДЕЛ 5: ОГРАНИЧЕНИЯ ТЕСТИРОВАНИЯ (нумерованный список!) ===
     doc.add_heading('5. ОГРАНИЧЕНИЯ ТЕСТИРОВАНИЯ', 1)
-    # ВАЖНО: в образце используется нумерованный список (1., 2., 3.), а не маркированный
-    for line in data['limitations'].split('\n'):
-        if line.strip():
-            # Убираем автоматическую нумерацию, если пользователь уже ввёл её
-            clean_line = line.strip()
-            if not clean_line[0].isdigit():
-                # Если нет нумерации — добавляем вручную
-                p = doc.add_paragraph(clean_line, style='List Number')
-            else:
-                p = doc.add_paragraph(clean_line)
-            p.paragraph_format.space_after = Pt(2)
-    doc.add_paragraph().paragraph_format.space_after = Pt(6)
+    # ВАЖНО: в образце используется нумерованный список (1., 2., 3.), а не маркированный.
+    # Строки, которые пользователь уже пронумеровал, идут обычным абзацем
+    _add_line_paragraphs(doc, (
+        (line, None if line[0].isdigit() else 'List Number')
+        for line in _text_lines(data['limitations'])
+    ))
+    _add_spacer(doc, 6)
     
     # === РАЗДЕЛ 6: ВЫВОД И РЕКОМЕНДАЦИИ ===
     doc.add_heading('6. ВЫВОД И РЕКОМЕНДАЦИИ', 1)
@@ -284,40 +426,27 @@ def generate_docx(data, module_data_list, defects_df):
     p = doc.add_paragraph()
     p.add_run('Вывод: ').bold = True
     p.add_run(data['conclusion'])
-    doc.add_paragraph().paragraph_format.space_after = Pt(6)
+    _add_spacer(doc, 6)
     
     # Рекомендации: маркированный список
     p = doc.add_paragraph()
     p.add_run('Рекомендации:').bold = True
-    doc.add_paragraph().paragraph_format.space_after = Pt(2)
-    for line in data['recommendations_detailed'].split('\n'):
-        if line.strip():
-            p = doc.add_paragraph(line.strip(), style='List Bullet')
-            p.paragraph_format.left_indent = Inches(0.25)
-            p.paragraph_format.space_after = Pt(2)
+    _add_spacer(doc, 2)
+    _add_line_paragraphs(
+        doc,
+        ((line, 'List Bullet') for line in _text_lines(data['recommendations_detailed'])),
+        left_indent=lengths.list_indent,
+    )
     
     # === РАЗДЕЛ 7: ПОДПИСЬ (чистая таблица 3×2 без артефактов) ===
     doc.add_heading('7. ПОДПИСЬ', 1)
-    signature_table = doc.add_table(rows=3, cols=2)
-    signature_table.style = 'Table Grid'
-    set_col_width(signature_table.columns[0], first_col_width_twips)
-    set_col_width(signature_table.columns[1], second_col_width_twips)
     
     signature_fields = [
         ('Роль :', data['role']),
         ('ФИО :', data['fullname']),
         ('Дата :', data['signature_date'])
     ]
-    for i, (label, value) in enumerate(signature_fields):
-        cell1 = signature_table.cell(i, 0)
-        cell1.text = label
-        cell1.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-        for run in cell1.paragraphs[0].runs:
-            run.font.bold = True
-        
-        cell2 = signature_table.cell(i, 1)
-        cell2.text = value
-        cell2.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    _add_kv_table(doc, signature_fields, first_col_width_twips, second_col_width_twips)
     
     # Сохранение документа
     buffer = io.BytesIO()
@@ -325,90 +454,102 @@ def generate_docx(data, module_data_list, defects_df):
     buffer.seek(0)
     return buffer
 
-def generate_chart_base64(pass_count, fail_count, s1_count, s2_count):
-    """Генерирует диаграммы в base64"""
-    plt.figure(figsize=(6, 4.5))
-    plt.pie(
-        [pass_count, fail_count],
-        labels=['PASS', 'FAIL'],
-        autopct='%1.1f%%',
-        colors=['#4CAF50', '#F44336'],
-        startangle=90,
-        textprops={'fontsize': 11}
-    )
-    plt.title('Рис. 1. Распределение результатов тест-кейсов', fontsize=10, pad=15)
-    buf1 = io.BytesIO()
-    plt.savefig(buf1, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
-    
-    plt.figure(figsize=(6, 4.5))
-    bars = plt.bar(
-        ['Critical (S1)', 'Major (S2)'],
-        [s1_count, s2_count],
-        color=['#F44336', '#FF9800'],
-        width=0.5
-    )
-    plt.title('Рис. 2. Дефекты по уровню серьёзности', fontsize=10, pad=15)
-    plt.ylabel('Количество', fontsize=11)
-    plt.ylim(0, max(s1_count, s2_count, 1) * 1.3)
-    for bar in bars:
-        h = bar.get_height()
-        if h > 0:
-            plt.text(
-                bar.get_x() + bar.get_width()/2,
-                h + 0.05,
-                str(int(h)),
-                ha='center',
-                va='bottom',
-                fontsize=11,
-                fontweight='bold'
+def _pie_svg(pass_count, fail_count):
+    """Круговая диаграмма PASS/FAIL в виде inline SVG (для HTML-отчёта)"""
+    width, height = 360, 300
+    cx, cy, r = width / 2, height / 2, 120
+    svg = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}" role="img" aria-label="Распределение результатов тест-кейсов">'
+    ]
+    total = pass_count + fail_count
+    if total <= 0:
+        svg.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="#e0e0e0"/>')
+        svg.append(f'<text x="{cx}" y="{cy}" text-anchor="middle" dominant-baseline="middle" font-size="14">Нет данных</text>')
+        svg.append('</svg>')
+        return "".join(svg)
+
+    # Как startangle=90 в matplotlib: первый сектор начинается сверху и идёт против часовой стрелки
+    angle = 90.0
+    for label, value, color in (('PASS', pass_count, '#4CAF50'), ('FAIL', fail_count, '#F44336')):
+        if value <= 0:
+            continue
+        sweep = value / total * 360
+        if sweep >= 360:
+            svg.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}"/>')
+        else:
+            a1, a2 = math.radians(angle), math.radians(angle + sweep)
+            x1, y1 = cx + r * math.cos(a1), cy - r * math.sin(a1)
+            x2, y2 = cx + r * math.cos(a2), cy - r * math.sin(a2)
+            large_arc = 1 if sweep > 180 else 0
+            svg.append(
+                f'<path d="M {cx:.1f},{cy:.1f} L {x1:.1f},{y1:.1f} '
+                f'A {r},{r} 0 {large_arc},0 {x2:.1f},{y2:.1f} Z" fill="{color}"/>'
             )
-    plt.grid(axis='y', alpha=0.3, linestyle='--')
-    buf2 = io.BytesIO()
-    plt.savefig(buf2, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
-    
-    chart1_base64 = base64.b64encode(buf1.getvalue()).decode('utf-8')
-    chart2_base64 = base64.b64encode(buf2.getvalue()).decode('utf-8')
-    return chart1_base64, chart2_base64
+        mid = math.radians(angle + sweep / 2)
+        cos_mid, sin_mid = math.cos(mid), math.sin(mid)
+        svg.append(
+            f'<text x="{cx + 0.6 * r * cos_mid:.1f}" y="{cy - 0.6 * r * sin_mid:.1f}" text-anchor="middle" '
+            f'dominant-baseline="middle" font-size="14">{value / total * 100:.1f}%</text>'
+        )
+        anchor = 'start' if cos_mid >= 0 else 'end'
+        svg.append(
+            f'<text x="{cx + 1.1 * r * cos_mid:.1f}" y="{cy - 1.1 * r * sin_mid:.1f}" text-anchor="{anchor}" '
+            f'dominant-baseline="middle" font-size="14">{label}</text>'
+        )
+        angle += sweep
+    svg.append('</svg>')
+    return "".join(svg)
 
-def escape_html(text):
-    """Экранирование HTML для безопасности"""
-    if pd.isna(text) or text is None:
-        return ""
-    if not isinstance(text, str):
-        return str(text)
-    return (str(text)
-            .replace('&', '&amp;')
-            .replace('<', '&lt;')
-            .replace('>', '&gt;')
-            .replace('"', '&quot;')
-            .replace("'", '&#39;'))
+def _bar_svg(s1_count, s2_count):
+    """Столбчатая диаграмма дефектов S1/S2 в виде inline SVG (для HTML-отчёта)"""
+    width, height = 360, 280
+    left, right, top, bottom = 50, 20, 20, 40
+    plot_w, plot_h = width - left - right, height - top - bottom
+    y_max = max(s1_count, s2_count, 1) * 1.3
+    step = max(1, math.ceil(y_max / 5))
 
-def format_multiline_html(text):
-    """Форматирование многострочного текста для HTML с экранированием"""
-    if pd.isna(text) or text is None:
-        return "—"
-    lines = [line.strip() for line in str(text).splitlines() if line.strip()]
-    if not lines:
-        return "—"
-    return "<br>".join(escape_html(line) for line in lines)
+    def y_of(v):
+        return top + plot_h - v / y_max * plot_h
 
-def generate_html_report(data, module_data_list, defects_df):
-    """Генерирует HTML-отчёт в соответствии с образцом"""
-    chart1, chart2 = generate_chart_base64(data['pass'], data['fail'], data['s1'], data['s2'])
-    total = data['total_tc']
-    pass_pct = data['pass'] / total * 100 if total > 0 else 0
-    fail_pct = 100 - pass_pct
-    
-    html = f"""<!DOCTYPE html>
-<html lang="ru">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>{escape_html(data['report_title'])}</title>
-<style>
-body {{
+    svg = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}" role="img" aria-label="Дефекты по уровню серьёзности">'
+    ]
+    # Сетка и подписи оси Y
+    tick = 0
+    while tick <= y_max:
+        y = y_of(tick)
+        svg.append(
+            f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" '
+            f'stroke="#000" stroke-opacity="0.3" stroke-dasharray="4,3"/>'
+        )
+        svg.append(f'<text x="{left - 6}" y="{y:.1f}" text-anchor="end" dominant-baseline="middle" font-size="12">{tick}</text>')
+        tick += step
+    svg.append(
+        f'<text x="14" y="{top + plot_h / 2:.1f}" text-anchor="middle" font-size="13" '
+        f'transform="rotate(-90 14 {top + plot_h / 2:.1f})">Количество</text>'
+    )
+    # Столбцы: ширина 0.5 от слота категории, как width=0.5 в matplotlib
+    slot = plot_w / 2
+    bar_w = slot * 0.5
+    for i, (label, value, color) in enumerate((('Critical (S1)', s1_count, '#F44336'), ('Major (S2)', s2_count, '#FF9800'))):
+        x_center = left + slot * (i + 0.5)
+        y = y_of(value)
+        svg.append(
+            f'<rect x="{x_center - bar_w / 2:.1f}" y="{y:.1f}" width="{bar_w:.1f}" '
+            f'height="{top + plot_h - y:.1f}" fill="{color}"/>'
+        )
+        if value > 0:
+            svg.append(f'<text x="{x_center:.1f}" y="{y - 4:.1f}" text-anchor="middle" font-size="13" font-weight="bold">{int(value)}</text>')
+        svg.append(f'<text x="{x_center:.1f}" y="{top + plot_h + 20}" text-anchor="middle" font-size="13">{label}</text>')
+    svg.append(f'<line x1="{left}" y1="{top + plot_h}" x2="{width - right}" y2="{top + plot_h}" stroke="#000"/>')
+    svg.append(f'<line x1="{left}" y1="{top}" x2="{left}" y2="{top + plot_h}" stroke="#000"/>')
+    svg.append('</svg>')
+    return "".join(svg)
+
+# Стили HTML-отчёта: постоянный текст, поэтому хранится отдельно от f-строки документа
+_REPORT_CSS = """body {
 font-family: Calibri Light, 'Segoe UI', sans-serif;
 font-size: 13pt;
 line-height: 1.5;
@@ -416,284 +557,406 @@ max-width: 800px;
 margin: 0 auto;
 padding: 20px;
 color: #000;
-}}
-h1 {{
+}
+h1 {
 text-align: center;
 font-size: 16pt;
 font-weight: bold;
 margin-bottom: 25px;
 margin-top: 0;
-}}
-h2 {{
+}
+h2 {
 font-size: 14pt;
 margin-top: 25px;
 margin-bottom: 12px;
 padding-bottom: 4px;
 border-bottom: 2px solid #000;
-}}
-h3 {{
+}
+h3 {
 font-size: 13pt;
 margin-top: 20px;
 margin-bottom: 10px;
-}}
-table {{
+}
+table {
 width: 100%;
 border-collapse: collapse;
 margin: 12px 0 18px 0;
 page-break-inside: avoid;
-}}
-th, td {{
+}
+th, td {
 border: 1px solid #000;
 padding: 8px 10px;
 text-align: left;
 vertical-align: top;
-}}
-th {{
+}
+th {
 background-color: #f5f5f5;
 font-weight: bold;
-}}
+}
 .info-table td:first-child,
 .summary-table td:first-child,
 .context-table td:first-child,
-.signature-table td:first-child {{
+.signature-table td:first-child {
 width: 25%;
 font-weight: bold;
 background-color: #f9f9f9;
-}}
-.status-pass {{ color: #2e7d32; font-weight: bold; }}
-.status-fail {{ color: #d32f2f; font-weight: bold; }}
-.risk {{ color: #d32f2f; font-weight: bold; }}
-.chart-container {{
+}
+.status-pass { color: #2e7d32; font-weight: bold; }
+.status-fail { color: #d32f2f; font-weight: bold; }
+.risk { color: #d32f2f; font-weight: bold; }
+.chart-container {
 text-align: center;
 margin: 25px 0;
 page-break-inside: avoid;
-}}
-.chart-title {{
+}
+.chart-container svg {
+max-width: 100%;
+height: auto;
+display: block;
+margin: 0 auto;
+}
+.chart-title {
 font-weight: bold;
 margin-top: 8px;
 font-size: 11pt;
-}}
-ol {{
+}
+ol {
 padding-left: 20px;
 margin: 10px 0;
-}}
-ul {{
+}
+ul {
 padding-left: 20px;
 margin: 10px 0;
-}}
-li {{
+}
+li {
 margin-bottom: 5px;
-}}
-@media print {{
-body {{
+}
+@media print {
+body {
 padding: 15px;
 -webkit-print-color-adjust: exact;
 print-color-adjust: exact;
-}}
-.chart-container img {{
+}
+.chart-container svg {
 max-width: 100% !important;
 height: auto !important;
-}}
-table {{
+}
+table {
 page-break-inside: avoid;
-}}
-h2, h3 {{
+}
+h2, h3 {
 page-break-after: avoid;
-}}
-}}
-@page {{
+}
+}
+@page {
 size: A4;
 margin: 15mm;
-}}
-</style>
+}
+"""
+
+# CSS-класс ячейки статуса: статусы приходят из фиксированного списка (PASS/FAIL)
+_STATUS_CLASS = {
+    "PASS": "status-pass", "pass": "status-pass",
+    "FAIL": "status-fail", "fail": "status-fail",
+}
+
+# Таблица замен для escape_html: один проход str.translate вместо пяти .replace
+_HTML_ESCAPE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;',
+})
+
+def escape_html(text):
+    """Экранирование HTML для безопасности"""
+    if isinstance(text, str):
+        return text.translate(_HTML_ESCAPE)
+    if text is None or pd.isna(text):
+        return ""
+    return str(text)
+
+def format_multiline_html(text):
+    """Форматирование многострочного текста для HTML с экранированием"""
+    if pd.isna(text) or text is None:
+        return "—"
+    lines = [line.strip() for line in str(text).splitlines() if line.strip()]
+    if not lines:
+        return "—"
+    return "<br>".join(escape_html(line) for line in lines)
+
+def generate_html_report(data, module_data_list, defects):
+    """Генерирует HTML-отчёт в соответствии с образцом"""
+    chart1 = _pie_svg(data['pass'], data['fail'])
+    chart2 = _bar_svg(data['s1'], data['s2'])
+    pass_pct, fail_pct = _pass_fail_percentages(data)
+    # Все текстовые поля экранируются один раз и дальше подставляются готовыми
+    esc = {key: escape_html(value) if isinstance(value, str) else value for key, value in data.items()}
+    
+    # Части документа собираются в список и склеиваются одним join в конце
+    parts = [f"""<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{esc['report_title']}</title>
+<style>
+""", _REPORT_CSS, f"""</style>
 </head>
 <body>
-<h1>{escape_html(data['report_title'])}</h1>
+<h1>{esc['report_title']}</h1>
 <table class="info-table">
-<tr><td>Проект:</td><td>{escape_html(data['project'])}</td></tr>
-<tr><td>Тип приложения:</td><td>{escape_html(data['app_type'])}</td></tr>
-<tr><td>Версия приложения:</td><td>{escape_html(data['version'])}</td></tr>
-<tr><td>Период тестирования:</td><td>{escape_html(data['test_period'])}</td></tr>
-<tr><td>Дата формирования отчёта:</td><td>{escape_html(data['report_date'])}</td></tr>
-<tr><td>QA-инженер:</td><td>{escape_html(data['engineer'])}</td></tr>
+<tr><td>Проект:</td><td>{esc['project']}</td></tr>
+<tr><td>Тип приложения:</td><td>{esc['app_type']}</td></tr>
+<tr><td>Версия приложения:</td><td>{esc['version']}</td></tr>
+<tr><td>Период тестирования:</td><td>{esc['test_period']}</td></tr>
+<tr><td>Дата формирования отчёта:</td><td>{esc['report_date']}</td></tr>
+<tr><td>QA-инженер:</td><td>{esc['engineer']}</td></tr>
 </table>
 <h2>1. КРАТКОЕ РЕЗЮМЕ</h2>
 <table class="summary-table">
-<tr><td>Статус релиза:</td><td>{escape_html(data['release_status'])}</td></tr>
+<tr><td>Статус релиза:</td><td>{esc['release_status']}</td></tr>
 <tr><td>Критические дефекты (S1):</td><td>{data['s1']}</td></tr>
 <tr><td>Мажорные дефекты (S2):</td><td>{data['s2']}</td></tr>
 <tr><td>Всего тест-кейсов:</td><td>{data['total_tc']}</td></tr>
 <tr><td>Успешно (Pass):</td><td class="status-pass">{data['pass']} ({pass_pct:.1f}%)</td></tr>
 <tr><td>Упали (Fail):</td><td class="status-fail">{data['fail']} ({fail_pct:.1f}%)</td></tr>
-<tr><td>Основной риск:</td><td class="risk">{escape_html(data['risk'])}</td></tr>
-<tr><td>Рекомендация:</td><td>{escape_html(data['recommendation'])}</td></tr>
+<tr><td>Основной риск:</td><td class="risk">{esc['risk']}</td></tr>
+<tr><td>Рекомендация:</td><td>{esc['recommendation']}</td></tr>
 </table>
 <div class="chart-container">
-<img src="data:image/png;base64,{chart1}" alt="Распределение результатов тест-кейсов" style="max-width: 100%; height: auto; display: block; margin: 0 auto;">
+{chart1}
 <div class="chart-title">Рис. 1. Распределение результатов тест-кейсов</div>
 </div>
 <div class="chart-container">
-<img src="data:image/png;base64,{chart2}" alt="Дефекты по уровню серьёзности" style="max-width: 100%; height: auto; display: block; margin: 0 auto;">
+{chart2}
 <div class="chart-title">Рис. 2. Дефекты по уровню серьёзности</div>
 </div>
 <h2>2. КОНТЕКСТ ТЕСТИРОВАНИЯ</h2>
 <table class="context-table">
-<tr><td>Устройство / Браузер:</td><td>{escape_html(data['device_browser'])}</td></tr>
-<tr><td>ОС / Платформа:</td><td>{escape_html(data['os_platform'])}</td></tr>
-<tr><td>Сборка / Версия:</td><td>{escape_html(data['build'])}</td></tr>
-<tr><td>Стенд:</td><td>Тестовое окружение (адрес: {escape_html(data['env_url'])})</td></tr>
-<tr><td>Инструменты:</td><td>{escape_html(data['tools'])}</td></tr>
-<tr><td>Методология:</td><td>{escape_html(data['methodology'])}</td></tr>
+<tr><td>Устройство / Браузер:</td><td>{esc['device_browser']}</td></tr>
+<tr><td>ОС / Платформа:</td><td>{esc['os_platform']}</td></tr>
+<tr><td>Сборка / Версия:</td><td>{esc['build']}</td></tr>
+<tr><td>Стенд:</td><td>Тестовое окружение (адрес: {esc['env_url']})</td></tr>
+<tr><td>Инструменты:</td><td>{esc['tools']}</td></tr>
+<tr><td>Методология:</td><td>{esc['methodology']}</td></tr>
 </table>
-"""
+"""]
     
     # === РАЗДЕЛ 3: РЕЗУЛЬТАТЫ ПО МОДУЛЯМ ===
-    html += "<h2>3. РЕЗУЛЬТАТЫ ТЕСТИРОВАНИЯ ПО МОДУЛЯМ</h2>"
+    parts.append("<h2>3. РЕЗУЛЬТАТЫ ТЕСТИРОВАНИЯ ПО МОДУЛЯМ</h2>")
     for idx, module_info in enumerate(module_data_list):
-        html += f"<h3>3.{idx+1}. {escape_html(module_info['title'])}</h3>"
+        parts.append(f"<h3>3.{idx+1}. {escape_html(module_info['title'])}</h3>")
         # Исправленные ширины колонок: Сценарий увеличен до 45%, Комментарий уменьшен до 28%
-        html += '<table><tr><th style="width: 15%;">ID</th><th style="width: 45%;">Сценарий</th><th style="width: 12%;">Статус</th><th style="width: 28%;">Комментарий</th></tr>'
-        df = module_info['df']
-        if not df.empty and len(df.columns) >= 4:
-            for _, row in df.iterrows():
-                # Определяем CSS-класс для цветового выделения статуса
-                status_class = "status-pass" if str(row[2]).upper() == "PASS" else "status-fail" if str(row[2]).upper() == "FAIL" else ""
-                html += f"<tr><td>{escape_html(row[0])}</td><td>{escape_html(row[1])}</td><td class='{status_class}'>{escape_html(row[2])}</td><td>{escape_html(row[3])}</td></tr>"
+        parts.append('<table><tr><th style="width: 15%;">ID</th><th style="width: 45%;">Сценарий</th><th style="width: 12%;">Статус</th><th style="width: 28%;">Комментарий</th></tr>')
+        if module_info['rows'] and len(module_info['columns']) >= 4:
+            # CSS-класс статуса даёт цветовое выделение PASS/FAIL
+            parts.append("".join([
+                f"<tr><td>{escape_html(row[0])}</td><td>{escape_html(row[1])}</td><td class='{_STATUS_CLASS.get(row[2], '')}'>{escape_html(row[2])}</td><td>{escape_html(row[3])}</td></tr>"
+                for row in module_info['rows']
+            ]))
         else:
-            html += "<tr><td colspan='4' style='text-align:center'>Нет данных</td></tr>"
-        html += "</table>"
+            parts.append("<tr><td colspan='4' style='text-align:center'>Нет данных</td></tr>")
+        parts.append("</table>")
     
     # Дефекты
-    html += "<h2>4. АНАЛИЗ ДЕФЕКТОВ</h2>"
-    html += '<table><tr><th style="width: 15%;">ID</th><th style="width: 15%;">Модуль</th><th>Заголовок</th><th style="width: 20%;">Серьёзность</th><th style="width: 15%;">Статус</th></tr>'
-    if not defects_df.empty and len(defects_df.columns) >= 5:
-        for _, row in defects_df.iterrows():
-            html += f"<tr><td>{escape_html(row[0])}</td><td>{escape_html(row[1])}</td><td>{escape_html(row[2])}</td><td>{escape_html(row[3])}</td><td>{escape_html(row[4])}</td></tr>"
+    parts.append("<h2>4. АНАЛИЗ ДЕФЕКТОВ</h2>")
+    parts.append('<table><tr><th style="width: 15%;">ID</th><th style="width: 15%;">Модуль</th><th>Заголовок</th><th style="width: 20%;">Серьёзность</th><th style="width: 15%;">Статус</th></tr>')
+    if defects['rows'] and len(defects['columns']) >= 5:
+        parts.append("".join([
+            f"<tr><td>{escape_html(row[0])}</td><td>{escape_html(row[1])}</td><td>{escape_html(row[2])}</td><td>{escape_html(row[3])}</td><td>{escape_html(row[4])}</td></tr>"
+            for row in defects['rows']
+        ]))
     else:
-        html += "<tr><td colspan='5' style='text-align:center'>Нет данных</td></tr>"
-    html += "</table>"
+        parts.append("<tr><td colspan='5' style='text-align:center'>Нет данных</td></tr>")
+    parts.append("</table>")
     
     # Последствия
-    html += f"<p><strong>Последствия:</strong> {format_multiline_html(data['consequences'])}</p>"
+    parts.append(f"<p><strong>Последствия:</strong> {format_multiline_html(data['consequences'])}</p>")
     
     # Ограничения (нумерованный список!)
-    html += "<h2>5. ОГРАНИЧЕНИЯ ТЕСТИРОВАНИЯ</h2><ol>"
-    for line in data['limitations'].split('\n'):
-        if line.strip():
-            html += f"<li>{escape_html(line.strip())}</li>"
-    html += "</ol>"
+    parts.append("<h2>5. ОГРАНИЧЕНИЯ ТЕСТИРОВАНИЯ</h2><ol>")
+    parts.extend(f"<li>{escape_html(line)}</li>" for line in _text_lines(data['limitations']))
+    parts.append("</ol>")
     
     # Вывод и рекомендации
-    html += f"""
+    parts.append(f"""
 <h2>6. ВЫВОД И РЕКОМЕНДАЦИИ</h2>
-<p><strong>Вывод:</strong> {escape_html(data['conclusion'])}</p>
+<p><strong>Вывод:</strong> {esc['conclusion']}</p>
 <p><strong>Рекомендации:</strong></p>
 <ul>
-"""
-    for line in data['recommendations_detailed'].split('\n'):
-        if line.strip():
-            html += f"<li>{escape_html(line.strip())}</li>"
-    html += "</ul>"
+""")
+    parts.extend(f"<li>{escape_html(line)}</li>" for line in _text_lines(data['recommendations_detailed']))
+    parts.append("</ul>")
     
     # Подпись
-    html += f"""
+    parts.append(f"""
 <h2>7. ПОДПИСЬ</h2>
 <table class="signature-table">
-<tr><td>Роль:</td><td>{escape_html(data['role'])}</td></tr>
-<tr><td>ФИО:</td><td>{escape_html(data['fullname'])}</td></tr>
-<tr><td>Дата:</td><td>{escape_html(data['signature_date'])}</td></tr>
+<tr><td>Роль:</td><td>{esc['role']}</td></tr>
+<tr><td>ФИО:</td><td>{esc['fullname']}</td></tr>
+<tr><td>Дата:</td><td>{esc['signature_date']}</td></tr>
 </table>
 </body>
-</html>"""
+</html>""")
     
-    buffer = io.BytesIO()
-    buffer.write(html.encode('utf-8'))
-    buffer.seek(0)
-    return buffer
+    # BytesIO, созданный из готовых байтов, уже стоит на позиции 0
+    return io.BytesIO("".join(parts).encode('utf-8'))
+
+# Ширины колонок A–E листа Excel
+COL_WIDTHS = {'A': 22, 'B': 14, 'C': 32, 'D': 12, 'E': 35}
+# Текстовые разделы Excel-отчёта: заголовок и ключ в data
+SECTION_SPECS = (
+    ("⚠️ ОГРАНИЧЕНИЯ ТЕСТИРОВАНИЯ", "limitations"),
+    ("💡 ВЫВОД", "conclusion"),
+    ("📌 РЕКОМЕНДАЦИИ", "recommendations_detailed"),
+)
+
+@functools.lru_cache(maxsize=None)
+def _xlsx_styles():
+    """Общие стили Excel-отчёта: создаются один раз и переиспользуются всеми ячейками"""
+    from types import SimpleNamespace
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+    def solid(color):
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+    # 🔴 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: цвета в формате ARGB (8 символов)
+    pass_style = (solid("FFC6EFCE"), Font(color="006100", bold=True))
+    fail_style = (solid("FFFFC7CE"), Font(color="9C0006", bold=True))
+    side = Side(style='thin')
+    return SimpleNamespace(
+        header_fill=solid("FF4472C4"),
+        section_fill=solid("FF5B9BD5"),
+        context_fill=solid("FF70AD47"),
+        defects_fill=solid("FF7030A0"),
+        notes_fill=solid("FFFFC000"),
+        signature_fill=solid("FF333333"),
+        title_font=Font(name='Calibri Light', size=16, bold=True, color="FFFFFF"),
+        section_font=Font(bold=True, size=12, color="FFFFFF"),
+        header_font=Font(bold=True, color="FFFFFF"),
+        bold_font=Font(bold=True),
+        # Заливка и шрифт ячейки статуса по значению (PASS/FAIL)
+        status_styles={"PASS": pass_style, "pass": pass_style, "FAIL": fail_style, "fail": fail_style},
+        thin_border=Border(left=side, right=side, top=side, bottom=side),
+        wrap_left=Alignment(wrap_text=True, vertical="top", horizontal="left"),
+        wrap_center=Alignment(wrap_text=True, vertical="center", horizontal="center"),
+        wrap_right=Alignment(wrap_text=True, vertical="top", horizontal="right"),
+    )
+
+def generate_xlsx_single_sheet(data, module_data_list, defects):
+    """Генерирует Excel-отчёт с исправленными цветами (формат ARGB).
+
+    Лист пишется в режиме write-only: каждая строка сериализуется сразу при
+    ws.append(), объекты ячеек не накапливаются в памяти.
+    """
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.worksheet.cell_range import CellRange
+    from openpyxl.worksheet.dimensions import ColumnDimension, DimensionHolder
 
-def generate_xlsx_single_sheet(data, module_data_list, defects_df):
-    """Генерирует Excel-отчёт с исправленными цветами (формат ARGB)"""
     output = io.BytesIO()
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Отчёт о тестировании"
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Отчёт о тестировании")
+    
+    # В режиме write-only ширины колонок задаются до записи первой строки:
+    # набор ColumnDimension собирается целиком и присваивается одним действием
+    column_dimensions = DimensionHolder(worksheet=ws)
+    for col_idx, (col_letter, width) in enumerate(COL_WIDTHS.items(), start=1):
+        column_dimensions[col_letter] = ColumnDimension(
+            ws, index=col_letter, min=col_idx, max=col_idx, width=width
+        )
+    ws.column_dimensions = column_dimensions
+    
+    styles = _xlsx_styles()
+    header_fill = styles.header_fill
+    thin_border = styles.thin_border
+    wrap_left, wrap_center, wrap_right = styles.wrap_left, styles.wrap_center, styles.wrap_right
+    
+    pass_pct, fail_pct = _pass_fail_percentages(data)
+    
+    row = 1  # номер следующей строки листа (нужен для объединения ячеек)
+    # Диапазоны объединения строятся из чисел, без разбора строк вида 'A1:E1', и
+    # кладутся прямо в множество: ws.merged_cells.add() проверял бы пересечение
+    # с каждым уже добавленным диапазоном, а строки листа не пересекаются
+    merged_ranges = ws.merged_cells.ranges
+    
+    # Индексы стилей (StyleArray) по сочетанию font/fill/alignment: каждое присваивание
+    # cell.font/.fill/... хэширует объект стиля для поиска в таблице стилей книги,
+    # поэтому сочетание регистрируется один раз, а остальные ячейки получают копию индексов
+    style_arrays = {}
+    
+    def styled(value=None, font=None, fill=None, alignment=None):
+        """Ячейка write-only с рамкой и заданными стилями"""
+        cell = WriteOnlyCell(ws, value=value)
+        key = (id(font), id(fill), id(alignment))
+        style_array = style_arrays.get(key)
+        if style_array is None:
+            cell.border = thin_border
+            if font is not None:
+                cell.font = font
+            if fill is not None:
+                cell.fill = fill
+            if alignment is not None:
+                cell.alignment = alignment
+            style_arrays[key] = copy.copy(cell._style)
+        else:
+            cell._style = copy.copy(style_array)
+        return cell
+    
+    def append_row(cells):
+        nonlocal row
+        ws.append(cells)
+        row += 1
     
-    COL_WIDTHS = {'A': 22, 'B': 14, 'C': 32, 'D': 12, 'E': 35}
+    # Пустые ячейки с рамкой внутри объединённых диапазонов одинаковы, а строка
+    # сериализуется сразу при ws.append(), поэтому одну ячейку можно переиспользовать
+    bordered_blank = styled()
     
-    # 🔴 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: цвета в формате ARGB (8 символов)
-    header_fill = PatternFill(start_color="FF4472C4", end_color="FF4472C4", fill_type="solid")
-    section_fill = PatternFill(start_color="FF5B9BD5", end_color="FF5B9BD5", fill_type="solid")
-    context_fill = PatternFill(start_color="FF70AD47", end_color="FF70AD47", fill_type="solid")
-    defects_fill = PatternFill(start_color="FF7030A0", end_color="FF7030A0", fill_type="solid")
-    notes_fill = PatternFill(start_color="FFFFC000", end_color="FFFFC000", fill_type="solid")
-    signature_fill = PatternFill(start_color="FF333333", end_color="FF333333", fill_type="solid")
-    
-    pass_fill = PatternFill(start_color="FFC6EFCE", end_color="FFC6EFCE", fill_type="solid")
-    fail_fill = PatternFill(start_color="FFFFC7CE", end_color="FFFFC7CE", fill_type="solid")
-    
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
+    def append_merged(value, font=None, fill=None, alignment=wrap_center):
+        """Строка, объединённая по A:E; значение и стиль — в левой верхней ячейке"""
+        merged_ranges.add(CellRange(min_col=1, min_row=row, max_col=5, max_row=row))
+        append_row([styled(value, font, fill, alignment)] + [bordered_blank] * 4)
     
-    wrap_left = Alignment(wrap_text=True, vertical="top", horizontal="left")
-    wrap_center = Alignment(wrap_text=True, vertical="center", horizontal="center")
-    wrap_right = Alignment(wrap_text=True, vertical="top", horizontal="right")
+    def append_label_value(label, value):
+        """Строка «метка — значение»: метка в A, значение в объединённых B:E"""
+        merged_ranges.add(CellRange(min_col=2, min_row=row, max_col=5, max_row=row))
+        append_row([
+            styled(label, styles.bold_font, alignment=wrap_right),
+            styled(value, alignment=wrap_left),
+        ] + [bordered_blank] * 3)
     
-    row = 1
+    def append_blank():
+        append_row([])
     
     # Заголовок
-    ws.merge_cells(f'A{row}:E{row}')
-    cell = ws.cell(row=row, column=1, value=data["report_title"])
-    cell.font = Font(name='Calibri Light', size=16, bold=True, color="FFFFFF")
-    cell.fill = header_fill
-    cell.alignment = wrap_center
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = thin_border
-    row += 2
+    append_merged(
+        data["report_title"], styles.title_font, header_fill
+    )
+    append_blank()
     
     # Ключевые метрики
-    ws.merge_cells(f'A{row}:E{row}')
-    cell = ws.cell(row=row, column=1, value="📊 КЛЮЧЕВЫЕ МЕТРИКИ")
-    cell.font = Font(bold=True, size=12, color="FFFFFF")
-    cell.fill = section_fill
-    cell.alignment = wrap_center
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = thin_border
-    row += 1
+    append_merged("📊 КЛЮЧЕВЫЕ МЕТРИКИ", styles.section_font, styles.section_fill)
     
     summary_rows = [
         ["Проект", data["project"]],
         ["Версия", data["version"]],
         ["Период тестирования", data["test_period"]],
         ["Всего тест-кейсов", str(data["total_tc"])],
-        ["Успешно (Pass)", f"{data['pass']} ({data['pass']/data['total_tc']*100:.1f}%)"],
-        ["Упали (Fail)", f"{data['fail']} ({data['fail']/data['total_tc']*100:.1f}%)"],
+        ["Успешно (Pass)", f"{data['pass']} ({pass_pct:.1f}%)"],
+        ["Упали (Fail)", f"{data['fail']} ({fail_pct:.1f}%)"],
         ["Critical (S1)", str(data["s1"])],
         ["Major (S2)", str(data["s2"])],
         ["Статус релиза", data["release_status"]],
         ["Рекомендация", data["recommendation"]],
     ]
     for label, value in summary_rows:
-        ws.cell(row=row, column=1, value=label).font = Font(bold=True)
-        ws.cell(row=row, column=1, value=label).border = thin_border
-        ws.cell(row=row, column=1, value=label).alignment = wrap_right
-        ws.merge_cells(f'B{row}:E{row}')
-        cell_value = ws.cell(row=row, column=2, value=value)
-        cell_value.border = thin_border
-        cell_value.alignment = wrap_left
-        row += 1
-    row += 1
+        append_label_value(label, value)
+    append_blank()
     
     # Контекст тестирования
-    ws.merge_cells(f'A{row}:E{row}')
-    cell = ws.cell(row=row, column=1, value="⚙️ КОНТЕКСТ ТЕСТИРОВАНИЯ")
-    cell.font = Font(bold=True, size=12, color="FFFFFF")
-    cell.fill = context_fill
-    cell.alignment = wrap_center
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = thin_border
-    row += 1
+    append_merged("⚙️ КОНТЕКСТ ТЕСТИРОВАНИЯ", styles.section_font, styles.context_fill)
     
     context_rows = [
         ["Устройство / Браузер", data["device_browser"]],
@@ -706,135 +969,65 @@ def generate_xlsx_single_sheet(data, module_data_list, defects_df):
         ["Дата формирования", data["report_date"]],
     ]
     for label, value in context_rows:
-        ws.cell(row=row, column=1, value=label).font = Font(bold=True)
-        ws.cell(row=row, column=1, value=label).border = thin_border
-        ws.cell(row=row, column=1, value=label).alignment = wrap_right
-        ws.merge_cells(f'B{row}:E{row}')
-        cell_value = ws.cell(row=row, column=2, value=value)
-        cell_value.border = thin_border
-        cell_value.alignment = wrap_left
-        row += 1
-    row += 1
+        append_label_value(label, value)
+    append_blank()
     
     # Результаты по модулям
-    ws.merge_cells(f'A{row}:E{row}')
-    cell = ws.cell(row=row, column=1, value="✅ РЕЗУЛЬТАТЫ ТЕСТИРОВАНИЯ ПО МОДУЛЯМ")
-    cell.font = Font(bold=True, size=12, color="FFFFFF")
-    cell.fill = section_fill
-    cell.alignment = wrap_center
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = thin_border
-    row += 1
+    append_merged("✅ РЕЗУЛЬТАТЫ ТЕСТИРОВАНИЯ ПО МОДУЛЯМ", styles.section_font, styles.section_fill)
     
     test_headers = ["Модуль", "ID", "Сценарий", "Статус", "Комментарий"]
-    for col_idx, header in enumerate(test_headers, start=1):
-        cell = ws.cell(row=row, column=col_idx, value=header)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = wrap_center
-    row += 1
+    append_row([
+        styled(header, styles.header_font, header_fill, wrap_center)
+        for header in test_headers
+    ])
     
     for module_info in module_data_list:
         module_name = module_info['title']
-        df = module_info['df']
-        if not df.empty and len(df.columns) >= 4:
-            for _, test_row in df.iterrows():
-                ws.cell(row=row, column=1, value=module_name).border = thin_border
-                ws.cell(row=row, column=1, value=module_name).alignment = wrap_left
-                ws.cell(row=row, column=2, value=test_row[0]).border = thin_border
-                ws.cell(row=row, column=2, value=test_row[0]).alignment = wrap_center
-                ws.cell(row=row, column=3, value=test_row[1]).border = thin_border
-                ws.cell(row=row, column=3, value=test_row[1]).alignment = wrap_left
-                
-                status_cell = ws.cell(row=row, column=4, value=test_row[2])
-                status_cell.border = thin_border
-                status_cell.alignment = wrap_center
-                if str(test_row[2]).upper() == "PASS":
-                    status_cell.fill = pass_fill
-                    status_cell.font = Font(color="006100", bold=True)
-                elif str(test_row[2]).upper() == "FAIL":
-                    status_cell.fill = fail_fill
-                    status_cell.font = Font(color="9C0006", bold=True)
-                
-                ws.cell(row=row, column=5, value=test_row[3]).border = thin_border
-                ws.cell(row=row, column=5, value=test_row[3]).alignment = wrap_left
-                row += 1
+        if module_info['rows'] and len(module_info['columns']) >= 4:
+            for test_row in module_info['rows']:
+                status_fill, status_font = styles.status_styles.get(test_row[2], (None, None))
+                status_cell = styled(test_row[2], status_font, status_fill, wrap_center)
+                append_row([
+                    styled(module_name, alignment=wrap_left),
+                    styled(test_row[0], alignment=wrap_center),
+                    styled(test_row[1], alignment=wrap_left),
+                    status_cell,
+                    styled(test_row[3], alignment=wrap_left),
+                ])
         else:
-            ws.merge_cells(f'A{row}:E{row}')
-            cell = ws.cell(row=row, column=1, value=f"Нет данных для модуля: {module_name}")
-            cell.alignment = wrap_center
-            cell.border = thin_border
-            row += 1
-    row += 1
+            append_merged(f"Нет данных для модуля: {module_name}")
+    append_blank()
     
     # Анализ дефектов
-    ws.merge_cells(f'A{row}:E{row}')
-    cell = ws.cell(row=row, column=1, value="🐞 АНАЛИЗ ДЕФЕКТОВ")
-    cell.font = Font(bold=True, size=12, color="FFFFFF")
-    cell.fill = defects_fill
-    cell.alignment = wrap_center
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = thin_border
-    row += 1
+    append_merged("🐞 АНАЛИЗ ДЕФЕКТОВ", styles.section_font, styles.defects_fill)
     
     defect_headers = ["ID", "Модуль", "Заголовок", "Серьёзность", "Статус"]
-    for col_idx, header in enumerate(defect_headers, start=1):
-        cell = ws.cell(row=row, column=col_idx, value=header)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = wrap_center
-    row += 1
-    
-    if not defects_df.empty and len(defects_df.columns) >= 5:
-        for _, defect_row in defects_df.iterrows():
-            for col_idx, value in enumerate(defect_row, start=1):
-                cell = ws.cell(row=row, column=col_idx, value=value if pd.notna(value) else "—")
-                cell.border = thin_border
-                cell.alignment = wrap_left if col_idx in (3, 5) else wrap_center
-            row += 1
+    append_row([
+        styled(header, styles.header_font, header_fill, wrap_center)
+        for header in defect_headers
+    ])
+    
+    if defects['rows'] and len(defects['columns']) >= 5:
+        # Заголовок (C) и статус (E) выравниваются влево, остальные колонки — по центру
+        col_alignments = (wrap_center, wrap_center, wrap_left, wrap_center, wrap_left)
+        for defect_row in defects['rows']:
+            append_row([
+                styled(value if value is not None else "—", alignment=alignment)
+                for value, alignment in zip(defect_row, col_alignments)
+            ])
     else:
-        ws.merge_cells(f'A{row}:E{row}')
-        cell = ws.cell(row=row, column=1, value="Нет зарегистрированных дефектов")
-        cell.alignment = wrap_center
-        cell.border = thin_border
-        row += 1
-    row += 1
+        append_merged("Нет зарегистрированных дефектов")
+    append_blank()
     
     # Ограничения, вывод, рекомендации
-    sections = [
-        ("⚠️ ОГРАНИЧЕНИЯ ТЕСТИРОВАНИЯ", data["limitations"]),
-        ("💡 ВЫВОД", data["conclusion"]),
-        ("📌 РЕКОМЕНДАЦИИ", data["recommendations_detailed"]),
-    ]
-    for title, content in sections:
-        ws.merge_cells(f'A{row}:E{row}')
-        cell = ws.cell(row=row, column=1, value=title)
-        cell.font = Font(bold=True, size=12, color="FFFFFF")
-        cell.fill = notes_fill
-        cell.alignment = wrap_center
-        for col in range(1, 6):
-            ws.cell(row=row, column=col).border = thin_border
-        row += 1
-        for line in content.split('\n'):
-            if line.strip():
-                ws.merge_cells(f'A{row}:E{row}')
-                cell = ws.cell(row=row, column=1, value=line.strip())
-                cell.alignment = wrap_left
-                cell.border = thin_border
-                row += 1
-        row += 1
+    for title, key in SECTION_SPECS:
+        append_merged(title, styles.section_font, styles.notes_fill)
+        for line in _text_lines(data[key]):
+            append_merged(line, alignment=wrap_left)
+        append_blank()
     
     # Подпись
-    ws.merge_cells(f'A{row}:E{row}')
-    cell = ws.cell(row=row, column=1, value="Подпись")
-    cell.font = Font(bold=True, size=12, color="FFFFFF")
-    cell.fill = signature_fill
-    cell.alignment = wrap_center
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = thin_border
-    row += 1
+    append_merged("Подпись", styles.section_font, styles.signature_fill)
     
     signature_rows = [
         ["Роль", data["role"]],
@@ -842,63 +1035,127 @@ def generate_xlsx_single_sheet(data, module_data_list, defects_df):
         ["Дата", data["signature_date"]],
     ]
     for label, value in signature_rows:
-        ws.cell(row=row, column=1, value=label).font = Font(bold=True)
-        ws.cell(row=row, column=1, value=label).border = thin_border
-        ws.cell(row=row, column=1, value=label).alignment = wrap_right
-        ws.merge_cells(f'B{row}:E{row}')
-        cell_value = ws.cell(row=row, column=2, value=value)
-        cell_value.border = thin_border
-        cell_value.alignment = wrap_left
-        row += 1
-    
-    for col_letter, width in COL_WIDTHS.items():
-        ws.column_dimensions[col_letter].width = width
+        append_label_value(label, value)
     
     wb.save(output)
     output.seek(0)
     return output
 
+# === КЭШ СГЕНЕРИРОВАННЫХ ОТЧЁТОВ ===
+def _report_fingerprint(data, module_data_list, defects):
+    """Отпечаток всех входных данных отчёта (blake2b от pickle)"""
+    payload = pickle.dumps((data, module_data_list, defects), protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _report_bytes(fingerprint, fmt, _data, _module_data_list, _defects):
+    """Готовый отчёт в формате fmt в виде bytes.
+
+    Ключ кэша — только отпечаток и формат: аргументы с подчёркиванием Streamlit не
+    хэширует, поэтому повторное скачивание тех же данных не пересобирает файл.
+    """
+    generator = {
+        "docx": generate_docx,
+        "html": generate_html_report,
+        "xlsx": generate_xlsx_single_sheet,
+    }[fmt]
+    return generator(_data, _module_data_list, _defects).getvalue()
+
+# === ВАЛИДАЦИЯ ВВОДА ===
+def _validate_report_inputs(report_title, total_tc, pass_tc, fail_tc, s1, s2, field_values):
+    """Проверяет введённые данные; возвращает список сообщений об ошибках (пустой — всё в порядке)"""
+    validation_errors = []
+    
+    # 🔴 КРИТИЧЕСКАЯ ВАЛИДАЦИЯ
+    if pass_tc + fail_tc != total_tc:
+        validation_errors.append(
+            f"⚠️ Сумма статусов ({pass_tc} PASS + {fail_tc} FAIL = {pass_tc + fail_tc}) "
+            f"не равна общему количеству тест-кейсов ({total_tc})"
+        )
+    
+    if total_tc <= 0:
+        validation_errors.append("❌ Общее количество тест-кейсов должно быть больше 0")
+    
+    if s1 < 0 or s2 < 0:
+        validation_errors.append("❌ Количество дефектов не может быть отрицательным")
+    
+    if not report_title.strip():
+        validation_errors.append("❌ Название отчёта не может быть пустым")
+    
+    # Проверка обязательных полей
+    for field, value in field_values.items():
+        if not value.strip():
+            validation_errors.append(f"❌ Поле '{field}' не может быть пустым")
+    
+    return validation_errors
+
 # === ДАННЫЕ ПО УМОЛЧАНИЮ (точно как в образце PDF) ===
-default_modules = [
-    {
-        "title": "Главный экран и навигация",
-        "df": pd.DataFrame([
-            ["MAIN-01", "Отображение карточек товаров", "PASS", "—"],
-            ["MAIN-02", "Фильтрация по категориям", "PASS", "—"],
-            ["NAV-01", "Переход между разделами", "PASS", "—"],
-            ["NAV-02", "Поиск товара с опечаткой", "FAIL", "BUG-SEARCH-001. Не находятся товары при ошибке в 1 символе (например, «мыло» → «мылоо»)"]
-        ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
-    },
-    {
-        "title": "Аутентификация и безопасность",
-        "df": pd.DataFrame([
-            ["AUTH-01", "Вход по логину/паролю", "PASS", "—"],
-            ["SEC-01", "SQL-инъекция в поле поиска", "FAIL", "BUG-SEC-001. При вводе `' OR '1'='1` — белый экран, частичный краш"],
-            ["SEC-02", "XSS-атака через поле поиска", "FAIL", "BUG-SEC-002. При вводе `<script>alert(1)</script>` — выполнение скрипта"]
-        ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
-    },
-    {
-        "title": "Каталог и корзина",
-        "df": pd.DataFrame([
-            ["CATALOG-01", "Отображение списка товаров", "PASS", "—"],
-            ["CART-01", "Добавление в корзину", "PASS", "—"],
-            ["CART-02", "Оформление заказа", "PASS", "—"]
-        ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
-    },
-    {
-        "title": "Дополнительные сценарии",
-        "df": pd.DataFrame([
-            ["OFFLINE-01", "Работа без интернета", "PASS", "Кэширование работает корректно"],
-            ["SPECIAL-01", "Поиск со спецсимволами (@, #, $)", "PASS", "—"]
-        ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
-    }
-]
+# Streamlit перезапускает скрипт при каждом изменении виджета: DataFrame'ы по
+# умолчанию строятся один раз, st.cache_data отдаёт на каждый вызов свою копию,
+# так что правки в st.data_editor не затрагивают кэш
+@st.cache_data
+def _default_modules():
+    """Модули с тест-кейсами по умолчанию"""
+    return [
+        {
+            "title": "Главный экран и навигация",
+            "df": pd.DataFrame([
+                ["MAIN-01", "Отображение карточек товаров", "PASS", "—"],
+                ["MAIN-02", "Фильтрация по категориям", "PASS", "—"],
+                ["NAV-01", "Переход между разделами", "PASS", "—"],
+                ["NAV-02", "Поиск товара с опечаткой", "FAIL", "BUG-SEARCH-001. Не находятся товары при ошибке в 1 символе (например, «мыло» → «мылоо»)"]
+            ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
+        },
+        {
+            "title": "Аутентификация и безопасность",
+            "df": pd.DataFrame([
+                ["AUTH-01", "Вход по логину/паролю", "PASS", "—"],
+                ["SEC-01", "SQL-инъекция в поле поиска", "FAIL", "BUG-SEC-001. При вводе `' OR '1'='1` — белый экран, частичный краш"],
+                ["SEC-02", "XSS-атака через поле поиска", "FAIL", "BUG-SEC-002. При вводе `<script>alert(1)</script>` — выполнение скрипта"]
+            ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
+        },
+        {
+            "title": "Каталог и корзина",
+            "df": pd.DataFrame([
+                ["CATALOG-01", "Отображение списка товаров", "PASS", "—"],
+                ["CART-01", "Добавление в корзину", "PASS", "—"],
+                ["CART-02", "Оформление заказа", "PASS", "—"]
+            ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
+        },
+        {
+            "title": "Дополнительные сценарии",
+            "df": pd.DataFrame([
+                ["OFFLINE-01", "Работа без интернета", "PASS", "Кэширование работает корректно"],
+                ["SPECIAL-01", "Поиск со спецсимволами (@, #, $)", "PASS", "—"]
+            ], columns=["ID", "Сценарий", "Статус", "Комментарий"])
+        }
+    ]
+
+@st.cache_data
+def _default_defects():
+    """Таблица дефектов по умолчанию"""
+    return pd.DataFrame([
+        ["BUG-SEARCH-001", "Поиск", "Не работает fuzzy search (поиск с опечатками)", "Major (S2)", "New"],
+        ["BUG-SEC-001", "Безопасность", "Уязвимость к SQL-инъекциям в поле поиска", "Critical (S1)", "New"],
+        ["BUG-SEC-002", "Безопасность", "Уязвимость к XSS-атакам в поле поиска", "Critical (S1)", "New"]
+    ], columns=["ID", "Модуль", "Заголовок", "Серьёзность", "Статус"])
 
-default_defects = pd.DataFrame([
-    ["BUG-SEARCH-001", "Поиск", "Не работает fuzzy search (поиск с опечатками)", "Major (S2)", "New"],
-    ["BUG-SEC-001", "Безопасность", "Уязвимость к SQL-инъекциям в поле поиска", "Critical (S1)", "New"],
-    ["BUG-SEC-002", "Безопасность", "Уязвимость к XSS-атакам в поле поиска", "Critical (S1)", "New"]
-], columns=["ID", "Модуль", "Заголовок", "Серьёзность", "Статус"])
+# Пустая таблица и настройки колонок редактора одинаковы для всех модулей:
+# st.cache_resource отдаёт один и тот же объект без копирования (data_editor его не изменяет)
+@st.cache_resource
+def _empty_module_df():
+    """Пустая таблица тест-кейсов для модулей сверх заданных по умолчанию"""
+    return pd.DataFrame(columns=["ID", "Сценарий", "Статус", "Комментарий"])
+
+@st.cache_resource
+def _module_column_config():
+    """Настройки колонок редактора тест-кейсов модуля"""
+    return {
+        "ID": st.column_config.TextColumn("ID", width="small"),
+        "Сценарий": st.column_config.TextColumn("Сценарий", width="medium"),
+        "Статус": st.column_config.SelectboxColumn("Статус", options=["PASS", "FAIL"], width="small"),
+        "Комментарий": st.column_config.TextColumn("Комментарий", width="large")
+    }
 
 # === ИНТЕРФЕЙС STREAMLIT (структура как в отчёте из PDF) ===
 st.set_page_config(page_title="Генератор отчёта", layout="wide")
@@ -961,6 +1218,7 @@ with st.form("main_form"):
     st.header("3. Результаты тестирования по модулям")
     num_modules = st.slider("Количество модулей", min_value=1, max_value=10, value=4)
     module_data_list = []
+    default_modules = _default_modules()
     for i in range(num_modules):
         with st.expander(f"Модуль 3.{i+1}", expanded=True):
             title = st.text_input(
@@ -969,24 +1227,19 @@ with st.form("main_form"):
                 key=f"title_{i}"
             )
             df_key = f"mod_{i}"
-            default_df = default_modules[i]["df"] if i < len(default_modules) else pd.DataFrame(columns=["ID", "Сценарий", "Статус", "Комментарий"])
+            default_df = default_modules[i]["df"] if i < len(default_modules) else _empty_module_df()
             df = st.data_editor(
                 default_df,
                 num_rows="dynamic",
                 key=df_key,
-                column_config={
-                    "ID": st.column_config.TextColumn("ID", width="small"),
-                    "Сценарий": st.column_config.TextColumn("Сценарий", width="medium"),
-                    "Статус": st.column_config.SelectboxColumn("Статус", options=["PASS", "FAIL"], width="small"),
-                    "Комментарий": st.column_config.TextColumn("Комментарий", width="large")
-                }
+                column_config=_module_column_config()
             )
             module_data_list.append({"title": title, "df": df})
     
     # === РАЗДЕЛ 4: АНАЛИЗ ДЕФЕКТОВ ===
     st.header("4. Анализ дефектов")
     defects = st.data_editor(
-        default_defects,
+        _default_defects(),
         num_rows="dynamic",
         key="defects",
         column_config={
@@ -1030,33 +1283,13 @@ with st.form("main_form"):
 
 # === ГЕНЕРАЦИЯ ОТЧЁТА ===
 if submitted:
-    validation_errors = []
-    
-    # 🔴 КРИТИЧЕСКАЯ ВАЛИДАЦИЯ
-    if pass_tc + fail_tc != total_tc:
-        validation_errors.append(
-            f"⚠️ Сумма статусов ({pass_tc} PASS + {fail_tc} FAIL = {pass_tc + fail_tc}) "
-            f"не равна общему количеству тест-кейсов ({total_tc})"
-        )
-    
-    if total_tc <= 0:
-        validation_errors.append("❌ Общее количество тест-кейсов должно быть больше 0")
-    
-    if s1 < 0 or s2 < 0:
-        validation_errors.append("❌ Количество дефектов не может быть отрицательным")
-    
-    if not report_title.strip():
-        validation_errors.append("❌ Название отчёта не может быть пустым")
-    
-    # Проверка обязательных полей
-    required_fields = ['project', 'version', 'env_url', 'engineer', 'test_period', 'report_date']
-    field_values = {
-        'project': project, 'version': version, 'env_url': env_url, 
-        'engineer': engineer, 'test_period': test_period, 'report_date': report_date
-    }
-    for field in required_fields:
-        if not field_values[field].strip():
-            validation_errors.append(f"❌ Поле '{field}' не может быть пустым")
+    validation_errors = _validate_report_inputs(
+        report_title, total_tc, pass_tc, fail_tc, s1, s2,
+        {
+            'project': project, 'version': version, 'env_url': env_url,
+            'engineer': engineer, 'test_period': test_period, 'report_date': report_date
+        }
+    )
     
     if validation_errors:
         for error in validation_errors:
@@ -1095,40 +1328,47 @@ if submitted:
     }
     
     try:
-        docx_buffer = generate_docx(data, module_data_list, defects)
-        html_buffer = generate_html_report(data, module_data_list, defects)
-        xlsx_buffer = generate_xlsx_single_sheet(data, module_data_list, defects)
+        # Файлы не собираются заранее: каждый формат генерируется только при нажатии
+        # на свою кнопку (Streamlit вызывает data-функцию в отдельном потоке) и
+        # кэшируется по отпечатку данных; ошибку data-функции Streamlit пишет в свой лог.
+        # on_click="ignore" оставляет кнопки на странице после скачивания.
+        report_args = (data, *_normalize_report_tables(module_data_list, defects))
+        fingerprint = _report_fingerprint(*report_args)
         
-        st.success("✅ Отчёт успешно создан!")
+        st.success("✅ Данные приняты. Выберите формат — файл сформируется при нажатии на кнопку.")
         
         col1, col2, col3 = st.columns(3)
         with col1:
             st.download_button(
                 "📄 DOCX",
-                docx_buffer,
+                functools.partial(_report_bytes, fingerprint, "docx", *report_args),
                 "Отчёт_о_тестировании.docx",
                 "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                on_click="ignore",
                 use_container_width=True,
                 type="primary"
             )
         with col2:
             st.download_button(
                 "🌐 HTML",
-                html_buffer,
+                functools.partial(_report_bytes, fingerprint, "html", *report_args),
                 "Отчёт_о_тестировании.html",
                 "text/html",
+                on_click="ignore",
                 use_container_width=True
             )
         with col3:
             st.download_button(
                 "📊 XLSX",
-                xlsx_buffer,
+                functools.partial(_report_bytes, fingerprint, "xlsx", *report_args),
                 "Отчёт_о_тестировании.xlsx",
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                on_click="ignore",
                 use_container_width=True
             )
     
     except Exception as e:
-        st.error(f"❌ Ошибка генерации отчёта: {str(e)}")
-        with st.expander("Детали ошибки (для отладки)"):
-            st.code(traceback.format_exc())
\ No newline at end of file
+        # Здесь ловятся только ошибки подготовки данных: сами файлы собираются при
+        # нажатии на кнопку, и их ошибки пишет в лог сам Streamlit
+        _logger.exception("Ошибка подготовки данных отчёта")
+        st.error(f"❌ Ошибка подготовки данных отчёта: {e}")
\ No newline at end of file